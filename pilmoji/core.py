@@ -3,19 +3,20 @@ from __future__ import annotations
 import asyncio
 import math
 
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
 import aiohttp
 
-import PIL
 from PIL import Image, ImageDraw, ImageFont
 
-from typing import Dict, Optional, SupportsInt, TYPE_CHECKING, Tuple, Type, TypeVar, Union
+from typing import Any, Dict, Optional, SupportsInt, TYPE_CHECKING, Tuple, Type, TypeVar, Union
 
-from .helpers import NodeType, getsize, to_nodes, paste_image_async
-from .source import BaseSource, HTTPBasedSource, Twemoji, CachedHTTPBasedSource
+from .helpers import _measure_text_width, _memoized, _text_width, NodeType, getsize, to_nodes, paste_image_async
+from .source import BaseSource, HTTPBasedSource, Twemoji, CachedHTTPBasedSource, _new_session
 
 if TYPE_CHECKING:
-    from io import BytesIO
-    
     FontT = Union[ImageFont.ImageFont, ImageFont.FreeTypeFont, ImageFont.TransposedFont]
     ColorT = Union[int, Tuple[int, int, int], Tuple[int, int, int, int], str]
 
@@ -29,6 +30,78 @@ __all__ = (
 )
 
 
+def _decode_emoji(data: bytes, /) -> Image.Image:
+    # decoded from a stream of its own, the one the source returned may be shared (and read
+    # from another thread at the same time) and it is the source's to close
+    image = Image.open(BytesIO(data))
+    image.load()
+
+    # emoji images are usually RGBA already, converting them would only copy every pixel
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+
+    return image
+
+
+def _resize_emoji(image: Image.Image, width: int, resample: Image.Resampling, /) -> Image.Image:
+    size = width, round(math.ceil(image.height / image.width * width))
+    return image.resize(size, resample)
+
+
+# measuring text crosses into Pillow's C code and shapes glyphs, while these measures only
+# depend on the font, the text and a few options, so they are memoized across `text` calls.
+# they are measured on a scratch draw with the same image mode and font mode as the target draw.
+@lru_cache(maxsize=None)
+def _scratch_draw(mode: str, fontmode: str, /) -> ImageDraw.ImageDraw:
+    draw = ImageDraw.Draw(Image.new(mode, (1, 1)))
+    draw.fontmode = fontmode
+    return draw
+
+
+def _measure_text_length(
+    font: FontT,
+    draw_modes: Tuple[str, str],
+    text: str,
+    direction: Optional[str],
+    features: Optional[Tuple[str, ...]],
+    language: Optional[str],
+    embedded_color: bool,
+    /
+) -> float:
+    return _scratch_draw(*draw_modes).textlength(
+        text, font, direction=direction, features=None if features is None else list(features),
+        language=language, embedded_color=embedded_color
+    )
+
+
+def _text_length(
+    font: FontT,
+    draw_modes: Tuple[str, str],
+    text: str,
+    direction: Optional[str],
+    features: Optional[Tuple[str, ...]],
+    language: Optional[str],
+    embedded_color: bool,
+    /
+) -> float:
+    return _memoized(_measure_text_length, font, draw_modes, text, direction, features, language, embedded_color)
+
+
+# this function was removed from pillow somewhere around 11.2
+# this is the same functin that pillow used
+# https://github.com/python-pillow/Pillow/blob/main/LICENSE
+def _measure_multiline_spacing(font: FontT, draw_modes: Tuple[str, str], spacing: float, stroke_width: int, /) -> float:
+    return (
+        _scratch_draw(*draw_modes).textbbox((0, 0), "A", font, stroke_width=stroke_width)[3]
+        + stroke_width
+        + spacing
+    )
+
+
+def _multiline_spacing(font: FontT, draw_modes: Tuple[str, str], spacing: float, stroke_width: int, /) -> float:
+    return _memoized(_measure_multiline_spacing, font, draw_modes, spacing, stroke_width)
+
+
 class PilmojiMain:
     """The main emoji rendering interface.
 
@@ -50,6 +123,25 @@ class PilmojiMain:
     emoji_position_offset: Tuple[int, int]
         A 2-tuple representing the x and y offset for emojis when rendering,
         respectively. Defaults to `(0, 0)`
+    fetch_concurrency: int
+        The maximum amount of emojis that can be fetched from the source at once.
+        HTTP-based sources also limit the requests they make at once on their own
+        (see :attr:`~.HTTPBasedSource.MAX_CONCURRENT_REQUESTS`), shared by every renderer
+        using them, so the lowest of the two applies. Defaults to `32`
+    session: Optional[:class:`aiohttp.ClientSession`]
+        The session used by HTTP-based sources, this is not closed with the renderer.
+        When not given, a session is created on enter and closed with the renderer.
+        See also :func:`~.get_default_session`.
+    resample: :class:`PIL.Image.Resampling`
+        The resampling filter used when resizing emojis.
+        Defaults to `Image.Resampling.BILINEAR`, use `Image.Resampling.LANCZOS`
+        for a slightly sharper but much slower result.
+    max_emoji_entries: int
+        The maximum amount of decoded emojis kept in memory,
+        for unicode and Discord emojis each. Defaults to `1024`
+    max_rendered_entries: int
+        The maximum amount of resized emojis kept in memory, there is one for each emoji
+        and size it has been rendered at. Defaults to `1024`
     """
 
     def __init__(
@@ -59,7 +151,12 @@ class PilmojiMain:
         cache: bool = True,
         render_discord_emoji: bool = True,
         emoji_scale_factor: float = 1.0,
-        emoji_position_offset: Tuple[int, int] = (0, 0)
+        emoji_position_offset: Tuple[int, int] = (0, 0),
+        fetch_concurrency: int = 32,
+        session: Optional[aiohttp.ClientSession] = None,
+        resample: Image.Resampling = Image.Resampling.BILINEAR,
+        max_emoji_entries: int = 1024,
+        max_rendered_entries: int = 1024
     ) -> None:
         if isinstance(source, type):
             if not issubclass(source, BaseSource):
@@ -71,8 +168,9 @@ class PilmojiMain:
             raise TypeError(f'source must inherit from BaseSource, not {source.__class__}.')
 
         self.source: BaseSource = source
-        
-        self._session = aiohttp.ClientSession()
+
+        self._session: Optional[aiohttp.ClientSession] = session
+        self._owns_session: bool = session is None
 
         self._cache: bool = cache
         self._closed: bool = False
@@ -81,9 +179,22 @@ class PilmojiMain:
         self._render_discord_emoji: bool = render_discord_emoji
         self._default_emoji_scale_factor: float = emoji_scale_factor
         self._default_emoji_position_offset: Tuple[int, int] = emoji_position_offset
-
-        self._emoji_cache: Dict[str, BytesIO] = {}
-        self._discord_emoji_cache: Dict[int, BytesIO] = {}
+        self._resample: Image.Resampling = resample
+
+        # emojis are kept decoded, so they don't have to be parsed again every time they are used.
+        # decoded images are much larger than the files they come from, so only the most recently
+        # used ones are kept
+        self._max_emoji_entries: int = max_emoji_entries
+        self._emoji_cache: OrderedDict[str, Image.Image] = OrderedDict()
+        self._discord_emoji_cache: OrderedDict[int, Image.Image] = OrderedDict()
+        # emojis decoded and resized to a given width, ready to be pasted.
+        # the least recently used ones are dropped first, since every font size makes new ones
+        self._max_rendered_entries: int = max_rendered_entries
+        self._rendered_cache: OrderedDict[Tuple[NodeType, str, int], Image.Image] = OrderedDict()
+
+        # all emojis of a text are fetched at once, this keeps messages with a lot of emojis
+        # from opening an unbounded amount of connections to the source
+        self._fetch_semaphore: asyncio.BoundedSemaphore = asyncio.BoundedSemaphore(fetch_concurrency)
 
     async def close(self) -> None:
         """Safely closes this renderer.
@@ -103,60 +214,125 @@ class PilmojiMain:
             del self.draw
             self.draw = None
 
-        if hasattr(self.source, "_session"):
-            await self.source._session.close()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
 
         if self._cache:
-            for stream in self._emoji_cache.values():
-                stream.close()
+            for image in self._emoji_cache.values():
+                image.close()
+
+            for image in self._discord_emoji_cache.values():
+                image.close()
 
-            for stream in self._discord_emoji_cache.values():
-                stream.close()
+            for asset in self._rendered_cache.values():
+                asset.close()
 
-            self._emoji_cache = {}
-            self._discord_emoji_cache = {}
+            self._emoji_cache = OrderedDict()
+            self._discord_emoji_cache = OrderedDict()
+            self._rendered_cache = OrderedDict()
 
         self._closed = True
 
-    async def _get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+    def _get_cached(self, type: NodeType, content: str, /) -> Optional[Image.Image]:
+        if not self._cache:
+            return None
+
+        if type is NodeType.emoji:
+            cache, key = self._emoji_cache, content
+        else:
+            cache, key = self._discord_emoji_cache, int(content)
+
+        image = cache.get(key)
+        if image is not None:
+            cache.move_to_end(key)
+
+        return image
+
+    def _store_decoded(self, cache: OrderedDict[Any, Image.Image], key: Any, image: Image.Image, /) -> None:
+        cache[key] = image
+        # dropped but not closed, a text that is still being drawn may be about to resize it
+        if len(cache) > self._max_emoji_entries:
+            cache.popitem(last=False)
+
+    async def _get_emoji(self, emoji: str, /) -> Optional[Image.Image]:
         if self._cache and emoji in self._emoji_cache:
-            entry = self._emoji_cache[emoji]
-            entry.seek(0)
-            return entry
+            self._emoji_cache.move_to_end(emoji)
+            return self._emoji_cache[emoji]
+
+        async with self._fetch_semaphore:
+            stream = await self.source.get_emoji(emoji)
 
-        stream = await self.source.get_emoji(emoji)
         if stream:
+            # the bytes are taken here, on the event loop, and only they are handed to the executor
+            image = await asyncio.get_running_loop().run_in_executor(None, _decode_emoji, stream.getvalue())
             if self._cache:
-                self._emoji_cache[emoji] = stream
+                self._store_decoded(self._emoji_cache, emoji, image)
 
-            stream.seek(0)
-            return stream
+            return image
 
-    async def _get_discord_emoji(self, id: SupportsInt | str, /) -> Optional[BytesIO]:
+    async def _get_discord_emoji(self, id: SupportsInt | str, /) -> Optional[Image.Image]:
         id = int(id)
 
         if self._cache and id in self._discord_emoji_cache:
-            entry = self._discord_emoji_cache[id]
-            entry.seek(0)
-            return entry
+            self._discord_emoji_cache.move_to_end(id)
+            return self._discord_emoji_cache[id]
+
+        # only sources that opt in (see `DiscordEmojiSourceMixin`) can retrieve Discord emojis
+        get_discord_emoji = getattr(self.source, 'get_discord_emoji', None)
+        if get_discord_emoji is None:
+            return None
+
+        async with self._fetch_semaphore:
+            stream = await get_discord_emoji(id)
 
-        stream = await self.source.get_discord_emoji(id)
         if stream:
+            image = await asyncio.get_running_loop().run_in_executor(None, _decode_emoji, stream.getvalue())
             if self._cache:
-                self._discord_emoji_cache[id] = stream
+                self._store_decoded(self._discord_emoji_cache, id, image)
+
+            return image
+
+    def _get_cached_rendered(self, type: NodeType, content: str, width: int, /) -> Optional[Image.Image]:
+        if not self._cache:
+            return None
+
+        key = type, content, width
+        asset = self._rendered_cache.get(key)
+        if asset is not None:
+            self._rendered_cache.move_to_end(key)
 
-            stream.seek(0)
-            return stream
+        return asset
+
+    async def _get_rendered(self, type: NodeType, content: str, image: Image.Image, width: int, /) -> Image.Image:
+        asset = self._get_cached_rendered(type, content, width)
+        if asset is not None:
+            return asset
+
+        key = type, content, width
+        # resizing is CPU heavy, so it runs in the default executor
+        asset = await asyncio.get_running_loop().run_in_executor(None, _resize_emoji, image, width, self._resample)
+        if self._cache:
+            self._rendered_cache[key] = asset
+            # dropped but not closed, a text that is still being drawn may be about to paste it
+            if len(self._rendered_cache) > self._max_rendered_entries:
+                self._rendered_cache.popitem(last=False)
+
+        return asset
 
     async def __aenter__(self: P) -> P:
         # if the source is an HTTPBasedSource and is not wrapped in a CachedHTTPBasedSource,
         # we wrap it in one to enable caching.
         # this is to ensure that the source is always cached if it is an HTTPBasedSource
-        self._session = await self._session.__aenter__()
         if isinstance(self.source, HTTPBasedSource):
+            self.source = CachedHTTPBasedSource(self.source)
+
+        # the session is only created when the source actually needs one
+        if isinstance(self.source, CachedHTTPBasedSource):
+            if self._session is None:
+                self._session = _new_session()
             self.source._session = self._session
-            if not isinstance(self.source, CachedHTTPBasedSource):
-                self.source = CachedHTTPBasedSource(self.source)
+
         return self
 
     async def __aexit__(self, *_) -> None:
@@ -180,22 +356,6 @@ class PilmojiDrawer:
             self._new_draw = True
             self.draw = ImageDraw.Draw(self.image)
 
-    # this function was removed from pillow somewhere around 11.2
-    # this is the same functin that pillow used
-    # https://github.com/python-pillow/Pillow/blob/main/LICENSE
-    def _multiline_spacing(
-        self,
-        font: ImageFont.ImageFont | ImageFont.FreeTypeFont | ImageFont.TransposedFont,
-        spacing: float,
-        stroke_width: int,
-    ) -> float:
-        assert self.draw
-        return (
-            self.draw.textbbox((0, 0), "A", font, stroke_width=stroke_width)[3]
-            + stroke_width
-            + spacing
-        )
-
     def getsize(
         self,
         text: str,
@@ -288,8 +448,13 @@ class PilmojiDrawer:
         if emoji_position_offset is None:
             emoji_position_offset = self._main._default_emoji_position_offset
 
+        text_width, text_length, multiline_spacing = _text_width, _text_length, _multiline_spacing
         if font is None:
             font = ImageFont.load_default()
+            # a new default font is made on every call, its measures would never be used again
+            text_width, text_length, multiline_spacing = (
+                _measure_text_width, _measure_text_length, _measure_multiline_spacing
+            )
 
         # first we need to test the anchor
         # because we want to make the exact same positions transformations than the "ImageDraw"."text" function in PIL
@@ -324,63 +489,106 @@ class PilmojiDrawer:
         original_x = x
         nodes = to_nodes(text)
         # get the distance between lines ( will be add to y between each line )
-        line_spacing = self._multiline_spacing(font, spacing, stroke_width)
+        draw_modes = self.draw.mode, self.draw.fontmode
+        line_spacing = multiline_spacing(font, draw_modes, spacing, stroke_width)
 
         # I change a part of the logic of text writing because it couldn't work "the same as PIL" if I didn't
         nodes_line_to_print = []
         widths = []
         max_width = 0
-        streams = {}
         mode = self.draw.fontmode
         if stroke_width == 0 and embedded_color:
             mode = "RGBA"
         ink = getink(fill)
         # we get the size taken by a " " to be drawn with the given options
-        space_text_lenght = self.draw.textlength(" ", font, direction=direction,
-                                                 features=features, language=language, embedded_color=embedded_color)
+        # features are made hashable so the measures can be memoized
+        features_key = None if features is None else tuple(features)
+        space_text_lenght = text_length(font, draw_modes, " ", direction, features_key, language, embedded_color)
+
+        # this will fetch the emojis of all lines asynchronously, all at once.
+        # each distinct emoji is only fetched once, and the ones already in cache are not awaited at all.
+        fetched: Dict[Tuple[NodeType, str], Optional[Image.Image]] = {}
+        fetches = {}
+        for line in nodes:
+            for node in line:
+                key = node.type, node.content
+                if node.type is NodeType.text or key in fetched or key in fetches:
+                    continue
+
+                if node.type is NodeType.discord_emoji and not self._main._render_discord_emoji:
+                    continue
+
+                cached = self._main._get_cached(*key)
+                if cached is not None:
+                    fetched[key] = cached
+
+                elif node.type is NodeType.emoji:
+                    fetches[key] = self._main._get_emoji(node.content)
 
+                else:
+                    fetches[key] = self._main._get_discord_emoji(node.content)
+
+        if fetches:
+            # the images missing from memory are read from the disk cache one after another,
+            # the OS is asked to start reading all of them beforehand
+            source = self._main.source
+            if len(fetches) > 1 and isinstance(source, CachedHTTPBasedSource):
+                source.prewarm(
+                    [content for type, content in fetches if type is NodeType.emoji],
+                    [int(content) for type, content in fetches if type is NodeType.discord_emoji],
+                )
+
+            fetched.update(zip(fetches, await asyncio.gather(*fetches.values())))
+
+        images = [[fetched.get((node.type, node.content)) for node in line] for line in nodes]
+
+        # these are the same for every emoji of the text
+        emoji_width = round(emoji_scale_factor * font.size)
+        ox, oy = emoji_position_offset
+        emoji_advance = node_spacing + emoji_width
+        # the equivalent space as " " caracter that is added to the line text for each emoji,
+        # texts without any emoji to draw never need it (and fonts can have a zero-width space)
+        emoji_padding = ""
+        if any(image is not None for image in fetched.values()):
+            # for every emoji we calculate the space needed to display it in the current text
+            space_to_had = round(round(emoji_width + ox + (node_spacing * 2)) / space_text_lenght)
+            emoji_padding = " " * space_to_had
+
+        # the emojis already resized to this width are taken from cache right away,
+        # the others are resized while the text is being laid out and drawn
+        assets: Dict[Tuple[NodeType, str], Image.Image] = {}
+        resizing: Dict[Tuple[NodeType, str], asyncio.Future[Image.Image]] = {}
+        for key, image in fetched.items():
+            if image is None:
+                continue
+
+            asset = self._main._get_cached_rendered(*key, emoji_width)
+            if asset is not None:
+                assets[key] = asset
+            else:
+                resizing[key] = asyncio.ensure_future(self._main._get_rendered(*key, image, emoji_width))
+
+        # how much x should move after each node, computed once here and reused when pasting emojis
+        advances = []
         for node_id, line in enumerate(nodes):
             text_line = ""
-            streams[node_id] = {}
-            
-            async def process_line(line_id, node):
-                content = node.content
-                stream = None
-                if node.type is NodeType.emoji:
-                    stream = await self._main._get_emoji(content)
-
-                elif self._main._render_discord_emoji and node.type is NodeType.discord_emoji:
-                    stream = await self._main._get_discord_emoji(content)
-
-                if stream:
-                    streams[node_id][line_id] = stream
-                
-                return node, stream
-            
-            # this will fetch all emojis asynchronously
-            streams_processed = await asyncio.gather(*[
-                process_line(line_id, node) for line_id, node in enumerate(line)
-            ])
-
-            for node, stream in streams_processed:
-                if node.type is NodeType.text or not stream:
+            line_advances = []
+            for line_id, node in enumerate(line):
+                if images[node_id][line_id] is None:
                     # each text in the same line are concatenate
                     text_line += node.content
+                    line_advances.append(node_spacing + text_width(font, node.content, direction, features_key, language))
                     continue
 
-                width = round(emoji_scale_factor * font.size)
-                ox, oy = emoji_position_offset
-                size = round(width + ox + (node_spacing * 2))
-                # for every emoji we calculate the space needed to display it in the current text
-                space_to_had = round(size / space_text_lenght)
-                # we had the equivalent space as " " caracter in the line text
-                text_line += "".join(" " for x in range(space_to_had))
+                text_line += emoji_padding
+                line_advances.append(emoji_advance)
+
+            advances.append(line_advances)
 
             # saving each line with the place to display emoji at the right place
             nodes_line_to_print.append(text_line)
-            line_width = self.draw.textlength(
-                text_line, font, direction=direction, features=features, language=language
-            )
+            # every line is usually different, so (unlike the per-font constants above) its width is never memoized
+            line_width = _measure_text_length(font, draw_modes, text_line, direction, features_key, language, False)
             widths.append(line_width)
             max_width = max(max_width, line_width)
 
@@ -470,28 +678,16 @@ class PilmojiDrawer:
                 x, line_y = coord
             
             for line_id, node in enumerate(line):
-                content = node.content
-
-                # if node is text then we decale our x
-                # but since the text line as already be drawn we do not need to draw text here anymore
-                if node.type is NodeType.text or line_id not in streams[node_id]:
-                    if tuple(int(part) for part in PIL.__version__.split(".")) >= (9, 2, 0):
-                        width = int(font.getlength(content, direction=direction, features=features, language=language))
-                    else:
-                        width, _ = font.getsize(content)
-                    x += node_spacing + width
-                    continue
-
-                if line_id in streams[node_id]:
-                    with Image.open(streams[node_id][line_id]).convert('RGBA') as asset:
-                        width = round(emoji_scale_factor * font.size)
-                        size = width, round(math.ceil(asset.height / asset.width * width))
-                        asset = asset.resize(size, Image.Resampling.LANCZOS)
-                        ox, oy = emoji_position_offset
-
-                        self.image.paste(asset, (round(x + ox), round(line_y + oy)), asset)
-
-                x += node_spacing + width
+                # if node is text then we only decale our x
+                # since the text line as already be drawn we do not need to draw text here anymore
+                if images[node_id][line_id] is not None:
+                    key = node.type, node.content
+                    asset = assets.get(key)
+                    if asset is None:
+                        asset = assets[key] = await resizing[key]
+                    self.image.paste(asset, (round(x + ox), round(line_y + oy)), asset)
+
+                x += advances[node_id][line_id]
             y += line_spacing
 
 
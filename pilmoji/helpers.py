@@ -2,19 +2,27 @@ from __future__ import annotations
 
 import asyncio
 import re
+import weakref
 
+from collections import OrderedDict
 from enum import Enum
+from functools import lru_cache
 
 import emoji
 
 import PIL
 from PIL import ImageFont, Image
 
-from typing import Dict, Final, List, NamedTuple, TYPE_CHECKING, Optional, Tuple
+from typing import Any, Callable, Dict, Final, Hashable, Iterable, List, NamedTuple, TYPE_CHECKING, Optional, Tuple, TypeVar
 
 if TYPE_CHECKING:
     from .core import FontT
 
+T = TypeVar('T')
+
+# ``FreeTypeFont.getlength`` was added (and ``getsize`` deprecated) in Pillow 9.2.0
+_PIL_GE_92: Final[bool] = tuple(int(part) for part in PIL.__version__.split('.')[:3]) >= (9, 2, 0)
+
 # This is actually way faster than it seems
 # Create a dictionary mapping English emoji descriptions to their unicode representations
 # Only include emojis that have an English description and are fully qualified
@@ -23,11 +31,59 @@ language_pack: Dict[str, str] = {
     for emj, data in emoji.EMOJI_DATA.items()
     if 'en' in data and data['status'] <= emoji.STATUS['fully_qualified']
 }
-_UNICODE_EMOJI_REGEX = '|'.join(map(re.escape, sorted(language_pack.values(), key=len, reverse=True)))
+
+
+def _trie_pattern(words: Iterable[str], /) -> str:
+    # Lays the literals out as a prefix trie, e.g. ``ab|abc|ad`` becomes ``a(?:b(?:c)?|d)``.
+    # At every position the regex engine then follows a single branch per character
+    # instead of trying thousands of alternatives in turn, while the greedy ``?``
+    # on terminal nodes keeps the leftmost-longest semantics of a length-sorted alternation.
+    # This runs on import, so each distinct character is only escaped once
+    # and the children are rendered in insertion order rather than sorted.
+    escaped: Dict[str, str] = {}
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            if char not in escaped:
+                escaped[char] = re.escape(char)
+            node = node.setdefault(escaped[char], {})
+        node[''] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = []
+        leaves = []
+        for char, child in node.items():
+            if not char:
+                continue
+            if len(child) == 1 and '' in child:
+                leaves.append(char)
+            else:
+                branches.append(char + render(child))
+
+        if len(leaves) == 1:
+            branches.append(leaves[0])
+        elif leaves:
+            branches.append('[' + ''.join(leaves) + ']')
+
+        if '' in node:
+            return '(?:' + '|'.join(branches) + ')?'
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return render(trie)
+
+
+_UNICODE_EMOJI_REGEX = _trie_pattern(language_pack.values())
 _DISCORD_EMOJI_REGEX = '<a?:[a-zA-Z0-9_]{1,32}:[0-9]{17,22}>'
 
 EMOJI_REGEX: Final[re.Pattern[str]] = re.compile(f'({_UNICODE_EMOJI_REGEX}|{_DISCORD_EMOJI_REGEX})')
 
+# Unicode emojis always contain non-ASCII codepoints, so ASCII-only lines
+# can skip the (much larger) unicode emoji pattern altogether.
+_DISCORD_EMOJI_PATTERN: Final[re.Pattern[str]] = re.compile(f'({_DISCORD_EMOJI_REGEX})')
+
 __all__ = (
     'EMOJI_REGEX',
     'Node',
@@ -75,10 +131,15 @@ class Node(NamedTuple):
         return f'<Node type={self.type.name!r} content={self.content!r}>'
 
 
-def _parse_line(line: str, /) -> List[Node]:
+# The same strings tend to be parsed over and over again (``getsize`` followed by ``text``,
+# or re-rendering the same message), so parsed lines are memoized. A tuple is returned
+# so the cached value can't be mutated by callers.
+@lru_cache(maxsize=4096)
+def _parse_line(line: str, /) -> Tuple[Node, ...]:
     nodes = []
+    pattern = _DISCORD_EMOJI_PATTERN if line.isascii() else EMOJI_REGEX
 
-    for i, chunk in enumerate(EMOJI_REGEX.split(line)):
+    for i, chunk in enumerate(pattern.split(line)):
         if not chunk:
             continue
 
@@ -93,7 +154,7 @@ def _parse_line(line: str, /) -> List[Node]:
 
         nodes.append(node)
 
-    return nodes
+    return tuple(nodes)
 
 
 def to_nodes(text: str, /) -> List[List[Node]]:
@@ -114,7 +175,95 @@ def to_nodes(text: str, /) -> List[List[Node]]:
     -------
     List[List[:class:`~.Node`]]
     """
-    return [_parse_line(line) for line in text.splitlines()]
+    return [list(_parse_line(line)) for line in text.splitlines()]
+
+
+# the most measures of one kind kept for a single font
+_FONT_MEMO_SIZE: Final[int] = 1024
+
+# measures are memoized per font. fonts are only weakly referenced, so their measures go away with them
+# and fonts made on the fly (e.g. with `ImageFont.truetype` for every request) don't pile up.
+# `None` marks the fonts that are never memoized
+_font_memos: weakref.WeakKeyDictionary[Any, Optional[Dict[Callable[..., Any], OrderedDict[Tuple[Hashable, ...], Any]]]] = weakref.WeakKeyDictionary()
+
+
+def _is_variable_font(font: FontT, /) -> bool:
+    # variable fonts can be changed in place (`set_variation_by_axes`), which would make their measures stale
+    if isinstance(font, ImageFont.TransposedFont):
+        font = font.font
+
+    if not isinstance(font, ImageFont.FreeTypeFont):
+        return False
+
+    try:
+        font.get_variation_axes()
+    except Exception:  # OSError for fonts that aren't variable
+        return False
+
+    return True
+
+
+def _memoized(measure: Callable[..., T], font: FontT, /, *args: Hashable) -> T:
+    """Returns ``measure(font, *args)``, memoized for the font.
+
+    At most ``_FONT_MEMO_SIZE`` measures are kept for each font and measure function,
+    the least recently used ones are dropped first.
+    """
+    try:
+        memos = _font_memos[font]
+    except KeyError:
+        memos = None if _is_variable_font(font) else {}
+        _font_memos[font] = memos
+    except TypeError:  # fonts that can't be weakly referenced
+        memos = None
+
+    if memos is None:
+        return measure(font, *args)
+
+    memo = memos.get(measure)
+    if memo is None:
+        memo = memos[measure] = OrderedDict()
+
+    value = memo.get(args)
+    if value is None:
+        value = memo[args] = measure(font, *args)
+        if len(memo) > _FONT_MEMO_SIZE:
+            memo.popitem(last=False)
+    else:
+        memo.move_to_end(args)
+
+    return value
+
+
+def _measure_text_width(
+    font: FontT,
+    content: str,
+    direction: Optional[str] = None,
+    features: Optional[Tuple[str, ...]] = None,
+    language: Optional[str] = None,
+    /
+) -> int:
+    if not _PIL_GE_92:
+        width, _ = font.getsize(content)
+        return width
+
+    if features is not None:
+        features = list(features)
+
+    return int(font.getlength(content, direction=direction, features=features, language=language))
+
+
+# `getsize` and `PilmojiDrawer.text` both measure every text node, usually with the same fonts
+# and contents (and often right after one another), so the measures are shared between them.
+def _text_width(
+    font: FontT,
+    content: str,
+    direction: Optional[str] = None,
+    features: Optional[Tuple[str, ...]] = None,
+    language: Optional[str] = None,
+    /
+) -> int:
+    return _memoized(_measure_text_width, font, content, direction, features, language)
 
 
 def getsize(
@@ -140,25 +289,23 @@ def getsize(
         The rescaling factor for emojis.
         Defaults to `1`.
     """
+    measure = _text_width
     if font is None:
         font = ImageFont.load_default()
+        # a new default font is made on every call, its measures would never be used again
+        measure = _measure_text_width
 
     x, y = 0, 0
     nodes = to_nodes(text)
+    emoji_width = int(emoji_scale_factor * font.size)
 
     for line in nodes:
         this_x = 0
         for node in line:
-            content = node.content
-
             if node.type is not NodeType.text:
-                width = int(emoji_scale_factor * font.size)
-            elif tuple(int(part) for part in PIL.__version__.split(".")) >= (9, 2, 0):
-                width = int(font.getlength(content))
+                this_x += emoji_width
             else:
-                width, _ = font.getsize(content)
-
-            this_x += width
+                this_x += measure(font, node.content)
 
         y += spacing + font.size
 
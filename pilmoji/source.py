@@ -1,16 +1,22 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
 from io import BytesIO
 
 from urllib.parse import quote_plus
 
 import os
+import re
+import zlib
+import time
 import hashlib
 import asyncio
 import logging
+import contextlib
+import itertools
 
-from typing import Any, ClassVar, Dict, Optional
+from typing import Any, Awaitable, Callable, ClassVar, Dict, Final, Iterable, Optional
 
-import aiofiles
 import aiohttp
 
 
@@ -36,13 +42,285 @@ __all__ = (
     'FacebookMessengerEmojiSource',
     'Twemoji',
     'Openmoji',
+    'get_default_session',
+    'set_cache_limit',
 )
 
+_log = logging.getLogger(__name__)
+
 CACHE_DIR = os.path.abspath(".cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+_DEFAULT_CACHE_LIMIT = 64 * 1024 * 1024
+
+
+def _cache_limit_from_env() -> Optional[int]:
+    value = os.environ.get('PILMOJI_CACHE_LIMIT', '').strip()
+    if not value:
+        return _DEFAULT_CACHE_LIMIT
+
+    try:
+        limit = int(value)
+    except ValueError:
+        _log.warning('Ignoring invalid PILMOJI_CACHE_LIMIT %r, it must be a size in bytes', value)
+        return _DEFAULT_CACHE_LIMIT
+
+    # like `set_cache_limit`, `0` means no limit at all
+    return limit if limit > 0 else None
+
+
+# the maximum size of CACHE_DIR in bytes, see `set_cache_limit`
+MAX_CACHE_BYTES: Optional[int] = _cache_limit_from_env()
+# the minimum amount of seconds between two scans of CACHE_DIR
+CACHE_EVICTION_INTERVAL: float = 60
+
+
+# aiohttp only has to clean up closed SSL transports on the Python versions that leave them open,
+# and warns when asked to anywhere else. versions of aiohttp that don't tell always need it
+_NEEDS_CLEANUP_CLOSED: Final[bool] = getattr(aiohttp.connector, 'NEEDS_CLEANUP_CLOSED', True)
+
+
+def _new_session() -> aiohttp.ClientSession:
+    # emojis are mostly fetched in bursts from a single host, so connections are allowed
+    # to stay alive to be reused by the next fetches, and the host is only resolved every 5 minutes
+    connector = aiohttp.TCPConnector(
+        limit=128,
+        limit_per_host=64,
+        keepalive_timeout=75,
+        ttl_dns_cache=300,
+        enable_cleanup_closed=_NEEDS_CLEANUP_CLOSED,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+_default_session: Optional[aiohttp.ClientSession] = None
+_default_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_default_session() -> aiohttp.ClientSession:
+    """Returns a :class:`aiohttp.ClientSession` shared by everything that uses it,
+    so its connection pool is reused across renderers.
+
+    The session is created on first use, and recreated if it has been closed
+    or belongs to another event loop. This must be called from a coroutine.
+
+    .. note::
+        Sessions passed to a renderer are never closed by it,
+        call ``await get_default_session().close()`` when you are done with it.
+
+    Returns
+    -------
+    :class:`aiohttp.ClientSession`
+    """
+    global _default_session, _default_session_loop
+
+    loop = asyncio.get_running_loop()
+    if _default_session is None or _default_session.closed or _default_session_loop is not loop:
+        _default_session = _new_session()
+        _default_session_loop = loop
+
+    return _default_session
+
+
+# makes temporary file names unique between concurrent writers of this process
+_temp_ids = itertools.count()
+
+
+def _sharded_path(cache_dir: str, name: str) -> str:
+    # files are spread over 256 subdirectories so that none of them grows large enough
+    # to slow lookups down. codepoints mostly share their first digits (most emojis start
+    # with `1f`), so the subdirectory is picked from a checksum of the name instead
+    return os.path.join(cache_dir, f'{zlib.crc32(name.encode()) & 0xff:02x}', name)
+
+
+# building the path of a cached image takes about as long as reading the file itself
+# when it is in the OS' page cache, so the paths of the most used emojis are memoized.
+# CACHE_DIR is part of the key so that it can still be changed at runtime
+@lru_cache(maxsize=4096)
+def _emoji_file_path(cache_dir: str, source_name: str, emoji: str, /) -> str:
+    # the codepoints are used as is, like Twemoji does with its file names (e.g. `1f44b.png`),
+    # it is cheaper than hashing and the cache stays easy to inspect
+    key = '-'.join([f'{ord(char):x}' for char in emoji])
+    return _sharded_path(cache_dir, f'{source_name}_{key}.png')
+
+
+def _read_cache_file(path: str) -> Optional[bytes]:
+    # cached images are small, so a blocking unbuffered read (sized with a single fstat)
+    # is much cheaper than a round-trip through a thread pool.
+    # opening directly instead of checking if the file exists first saves a syscall,
+    # and there is no window for the file to disappear between the check and the read.
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            return f.readall()
+    except FileNotFoundError:
+        return None
+
+
+def set_cache_limit(limit: Optional[int], /) -> None:
+    """Sets the maximum size of the emoji images cached on disk.
+
+    Once the cache grows past it, the least recently used images are removed.
+    Only the images written by pilmoji are counted and removed,
+    other files in ``CACHE_DIR`` are left alone.
+
+    The limit can also be set with the ``PILMOJI_CACHE_LIMIT`` environment variable,
+    in bytes, where ``0`` removes the limit.
+
+    Parameters
+    ----------
+    limit: Optional[int]
+        The maximum size of the cache in bytes, or `None` (or `0`) to let it grow without limit.
+        Defaults to 64 MiB.
+
+    Raises
+    ------
+    ValueError
+        The limit is negative.
+    """
+    global MAX_CACHE_BYTES, _last_eviction
+
+    if limit is not None and limit < 0:
+        raise ValueError('cache limit must not be negative')
+
+    MAX_CACHE_BYTES = limit or None
+    # so that the new limit is applied on the next write
+    _last_eviction = None
+
+
+# the names of the images cached by pilmoji, anything else that happens to be in CACHE_DIR is never touched.
+# images are named after their codepoints in the subdirectories, while older versions stored
+# them (named after a sha256 of the emoji) and Discord emojis directly in CACHE_DIR
+_CACHE_FILE_NAME: Final[re.Pattern[str]] = re.compile(r'\w+_[0-9a-f]+(?:-[0-9a-f]+)*\.png')
+_LEGACY_CACHE_FILE_NAME: Final[re.Pattern[str]] = re.compile(r'\w+_[0-9a-f]{64}\.png|discord_[0-9]+\.png')
+# the temporary files images are written to, see `CachedHTTPBasedSource._load`
+_TEMP_FILE_NAME: Final[re.Pattern[str]] = re.compile(r'(\w+_[0-9a-f]+(?:-[0-9a-f]+)*\.png)\.[0-9]+-[0-9]+\.tmp')
+_SHARD_NAME: Final[re.Pattern[str]] = re.compile(r'[0-9a-f]{2}')
+
+# temporary files are only left behind by processes that died mid-write,
+# one this old can't still be in the middle of being written
+_STALE_TEMP_AGE: Final[float] = 60 * 60
+
+
+def _scan_cache_dir(directory: str, /) -> Iterable[os.DirEntry]:
+    # anything that can't be read (removed since, or not ours to read) is skipped,
+    # this runs in the background where nothing would see the error
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return
+
+    with it:
+        yield from it
+
+
+def _evict_cache() -> None:
+    limit = MAX_CACHE_BYTES
+    now = time.time()
+
+    files = []
+    total = 0
+    shards = []
+    for entry in _scan_cache_dir(CACHE_DIR):
+        try:
+            # only the subdirectories pilmoji creates are scanned, never anything else in CACHE_DIR
+            if entry.is_dir(follow_symlinks=False):
+                if _SHARD_NAME.fullmatch(entry.name):
+                    shards.append(entry)
+                continue
+            if not _LEGACY_CACHE_FILE_NAME.fullmatch(entry.name):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        # reads update the access time at most once a day on most systems (relatime),
+        # so the modification time is used whenever it is more recent
+        files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+        total += stat.st_size
+
+    for shard in shards:
+        for entry in _scan_cache_dir(shard.path):
+            name = entry.name
+            temp = _TEMP_FILE_NAME.fullmatch(name)
+            if temp is not None:
+                name = temp.group(1)
+            elif not _CACHE_FILE_NAME.fullmatch(name):
+                continue
+
+            # a file pilmoji wrote is always in the subdirectory its name is sharded to
+            if _sharded_path(CACHE_DIR, name) != os.path.join(CACHE_DIR, shard.name, name):
+                continue
+
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+            if temp is not None:
+                if now - stat.st_mtime > _STALE_TEMP_AGE:
+                    with contextlib.suppress(OSError):
+                        os.unlink(entry.path)
+                continue
+
+            files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+            total += stat.st_size
+
+    if limit is None or total <= limit:
+        return
+
+    files.sort()
+    for _, size, path in files:
+        # another process sharing the cache may have removed it already
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+        total -= size
+        if total <= limit:
+            break
+
+
+_last_eviction: Optional[float] = None
+_eviction: Optional[asyncio.Future[None]] = None
+
+
+def _schedule_cache_eviction() -> None:
+    # called after every write, the directory is scanned (in the default executor, so the
+    # event loop isn't blocked) at most once every CACHE_EVICTION_INTERVAL seconds
+    global _last_eviction, _eviction
+
+    # this still runs without a limit, to remove the temporary files left behind by crashed writers
+    if _eviction is not None and not _eviction.done():
+        return
+
+    now = time.monotonic()
+    if _last_eviction is not None and now - _last_eviction < CACHE_EVICTION_INTERVAL:
+        return
+
+    _last_eviction = now
+    _eviction = asyncio.get_running_loop().run_in_executor(None, _evict_cache)
+
+
+def _write_cache_file(path: str, data: bytes) -> None:
+    # for the same reason writes are blocking too. they stay buffered, unlike reads,
+    # since a raw write is allowed to write only part of the data
+    try:
+        f = open(path, 'wb')
+    except FileNotFoundError:
+        # the directory is only created when the first file is written to it,
+        # this also recreates it if it has been removed since
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, 'wb')
+
+    with f:
+        f.write(data)
+
+
 class BaseSource(ABC):
-    """The base class for an emoji image source."""
+    """The base class for an emoji image source.
+
+    Sources that can also retrieve Discord emojis define a ``get_discord_emoji`` method,
+    see :class:`~.DiscordEmojiSourceMixin`. Discord emojis are not rendered with other sources.
+    """
 
     @abstractmethod
     async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
@@ -62,34 +340,48 @@ class BaseSource(ABC):
         """
         raise NotImplementedError
 
-    @abstractmethod
-    async def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
-        """Retrieves a :class:`io.BytesIO` stream for the image of the given Discord emoji.
+    async def get_emojis(self, emojis: Iterable[str], /) -> Dict[str, Optional[BytesIO]]:
+        """Retrieves the images of many emojis at once.
+
+        The emojis are fetched concurrently, and each distinct emoji is only fetched once.
 
         Parameters
         ----------
-        id: int
-            The snowflake ID of the Discord emoji.
+        emojis: Iterable[str]
+            The emojis to retrieve.
 
         Returns
         -------
-        :class:`io.BytesIO`
-            A bytes stream of the emoji.
-        None
-            An image for the emoji could not be found.
+        Dict[str, Optional[:class:`io.BytesIO`]]
+            A mapping of each emoji to its bytes stream, or `None` if an image could not be found.
         """
-        raise NotImplementedError
+        unique = list(dict.fromkeys(emojis))
+        return dict(zip(unique, await asyncio.gather(*[self.get_emoji(emoji) for emoji in unique])))
 
     def __repr__(self) -> str:
         return f'<{self.__class__.__name__}>'
 
 
 class HTTPBasedSource(BaseSource):
-    """Represents an HTTP-based source."""
+    """Represents an HTTP-based source.
+
+    A source makes at most :attr:`MAX_CONCURRENT_REQUESTS` requests at once, shared by every
+    renderer using it. Each renderer also fetches at most ``fetch_concurrency`` emojis at once
+    (see :class:`~.PilmojiMain`), cached or not, so a single renderer never has more
+    requests in flight than the lower of the two limits.
+    """
 
     REQUEST_KWARGS: ClassVar[Dict[str, Any]] = {
         'headers': {'User-Agent': 'Mozilla/5.0'}
     }
+    # the maximum amount of requests this source makes at once
+    MAX_CONCURRENT_REQUESTS: ClassVar[int] = 32
+    # the size of the chunks response bodies are read in
+    READ_CHUNK_SIZE: ClassVar[int] = 32768
+
+    # these are also defaults on the class, so that subclasses which don't call `__init__` still work
+    _session: Optional[aiohttp.ClientSession] = None
+    _request_semaphore: Optional[asyncio.Semaphore] = None
 
     def __init__(self):
         self._session: aiohttp.ClientSession | None = None
@@ -97,6 +389,9 @@ class HTTPBasedSource(BaseSource):
     async def request(self, url: str) -> BytesIO | None:
         """Makes a GET request to the given URL.
 
+        The session given to this source is used if there is one,
+        otherwise the request goes through :func:`get_default_session`.
+
         Parameters
         ----------
         url: str
@@ -112,20 +407,30 @@ class HTTPBasedSource(BaseSource):
             There was an error requesting from the URL.
         """
 
-        assert self._session is not None, "Session must be initialized before making requests"
+        session = self._session or get_default_session()
 
-        response = await self._session.get(url, timeout=aiohttp.ClientTimeout(total=10))
-        if response.ok:
-            return BytesIO(await response.content.read())
-        else:
-            raise aiohttp.ClientError(f'Failed to fetch emoji from {url}, status code: {response.status}')
+        # created on first use, within the event loop the requests are made from
+        semaphore = self._request_semaphore
+        if semaphore is None:
+            semaphore = self._request_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
 
-    @abstractmethod
-    async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
-        raise NotImplementedError
+        async with semaphore:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if not response.ok:
+                    raise aiohttp.ClientError(f'Failed to fetch emoji from {url}, status code: {response.status}')
+
+                # the chunks are written to the stream as they arrive instead of being joined at the end,
+                # so only one copy of the body is held at once. the stream is not built from a bytearray
+                # up front, since BytesIO copies bytearrays, while `getvalue()` shares its own buffer
+                stream = BytesIO()
+                async for chunk in response.content.iter_chunked(self.READ_CHUNK_SIZE):
+                    stream.write(chunk)
+
+        stream.seek(0)
+        return stream
 
     @abstractmethod
-    async def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+    async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
         raise NotImplementedError
 
 
@@ -139,15 +444,36 @@ class DiscordEmojiSourceMixin(HTTPBasedSource):
         raise NotImplementedError
 
     async def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+        """Retrieves a :class:`io.BytesIO` stream for the image of the given Discord emoji.
+
+        Parameters
+        ----------
+        id: int
+            The snowflake ID of the Discord emoji.
+
+        Returns
+        -------
+        :class:`io.BytesIO`
+            A bytes stream of the emoji.
+        None
+            An image for the emoji could not be found.
+        """
         url = self.BASE_DISCORD_EMOJI_URL + str(id) + '.png'
 
         try:
             return await self.request(url)
         except aiohttp.ClientError:
-            logging.critical(f'Failed to fetch Discord emoji with ID {id} from {url}')
+            _log.error('Failed to fetch Discord emoji with ID %s from %s', id, url)
             raise
 
 
+# the query string only depends on the style, so it is only quoted once for each of them.
+# it is keyed on the style itself, which can still be changed on a class or an instance at any time
+@lru_cache(maxsize=None)
+def _style_query(style: str, /) -> str:
+    return '?style=' + quote_plus(style)
+
+
 class EmojiCDNSource(DiscordEmojiSourceMixin):
     """A base source that fetches emojis from https://emojicdn.elk.sh/."""
 
@@ -158,11 +484,11 @@ class EmojiCDNSource(DiscordEmojiSourceMixin):
         if self.STYLE is None:
             raise TypeError('STYLE class variable unfilled.')
 
-        url = self.BASE_EMOJI_CDN_URL + quote_plus(emoji) + '?style=' + quote_plus(self.STYLE)
+        url = self.BASE_EMOJI_CDN_URL + quote_plus(emoji) + _style_query(self.STYLE)
         try:
             return await self.request(url)
         except aiohttp.ClientError:
-            logging.critical(f'Failed to fetch Discord emoji with ID {id} from {url}')
+            _log.error('Failed to fetch emoji %r from %s', emoji, url)
             raise
 
 
@@ -227,47 +553,184 @@ class MozillaEmojiSource(EmojiCDNSource):
 
 
 class CachedHTTPBasedSource(BaseSource):
-    """A wrapper for any HTTPBasedSource that caches emoji images in CACHE_DIR."""
+    """A wrapper for any HTTPBasedSource that caches emoji images in CACHE_DIR.
 
-    def __init__(self, source: HTTPBasedSource) -> None:
+    The most recently used images are also kept in memory,
+    so that repeated emojis don't have to be read from disk again.
+
+    Parameters
+    ----------
+    source: :class:`~.HTTPBasedSource`
+        The source to wrap.
+    max_entries: int
+        The maximum amount of emoji images kept in memory. Defaults to `4096`
+    """
+
+    def __init__(self, source: HTTPBasedSource, *, max_entries: int = 4096) -> None:
         if not isinstance(source, HTTPBasedSource):
             raise TypeError('source must be an instance of HTTPBasedSource')
         self._source = source
+        self._source_name = source.__class__.__name__
+
+        self._max_entries = max_entries
+        # raw bytes are stored (never bytearrays, which BytesIO would copy),
+        # they are immutable so every caller can safely share them
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._discord_memory: OrderedDict[int, bytes] = OrderedDict()
+        # loads currently in progress, by cache path, so concurrent misses for
+        # the same emoji share a single download and a single write
+        self._inflight: Dict[str, asyncio.Future[Optional[bytes]]] = {}
 
     @property
     def _session(self):
         return self._source._session
-    
+
+    @_session.setter
+    def _session(self, session: aiohttp.ClientSession | None) -> None:
+        self._source._session = session
+
     def _emoji_cache_path(self, emoji: str) -> str:
+        return _emoji_file_path(CACHE_DIR, self._source_name, emoji)
+
+    def _legacy_emoji_cache_path(self, emoji: str) -> str:
         key = hashlib.sha256(emoji.encode('utf-8')).hexdigest()
-        return os.path.join(CACHE_DIR, f'{self._source.__class__.__name__}_{key}.png')
+        return os.path.join(CACHE_DIR, f'{self._source_name}_{key}.png')
 
     def _discord_cache_path(self, id: int) -> str:
+        return _sharded_path(CACHE_DIR, f'discord_{id}.png')
+
+    def _legacy_discord_cache_path(self, id: int) -> str:
         return os.path.join(CACHE_DIR, f'discord_{id}.png')
 
-    async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
-        path = self._emoji_cache_path(emoji)
-        if os.path.exists(path):
-            async with aiofiles.open(path, 'rb') as f:
-                return BytesIO(await f.read())
-        data = await self._source.get_emoji(emoji)
+    async def _get_cached(
+        self,
+        memory: OrderedDict[Any, bytes],
+        key: Any,
+        cache_path: Callable[[Any], str],
+        fetch: Callable[[Any], Awaitable[Optional[BytesIO]]],
+        legacy_cache_path: Optional[Callable[[Any], str]] = None,
+    ) -> Optional[BytesIO]:
+        # a BytesIO created from `bytes` shares that buffer until it is written to,
+        # so every caller gets its own stream over the cached bytes without copying them
+        data = memory.get(key)
         if data is not None:
-            async with aiofiles.open(path, 'wb') as f:
-                await f.write(data.read())
-            data.seek(0)
-            return data
+            memory.move_to_end(key)
+            return BytesIO(data)
+
+        # the path (and the hash in it) is only computed when the file is actually needed
+        path = cache_path(key)
+
+        load = self._inflight.get(path)
+        if load is None:
+            load = asyncio.ensure_future(self._load(memory, key, path, fetch, legacy_cache_path))
+            self._inflight[path] = load
+            load.add_done_callback(lambda _: self._inflight.pop(path, None))
+
+        # shielded, so that a cancelled caller doesn't cancel the load for everyone else waiting on it
+        data = await asyncio.shield(load)
+        if data is None:
+            return None
+
+        return BytesIO(data)
+
+    async def _load(
+        self,
+        memory: OrderedDict[Any, bytes],
+        key: Any,
+        path: str,
+        fetch: Callable[[Any], Awaitable[Optional[BytesIO]]],
+        legacy_cache_path: Optional[Callable[[Any], str]],
+    ) -> Optional[bytes]:
+        data = _read_cache_file(path)
+        if data is None and legacy_cache_path is not None:
+            # files cached by older versions are moved to their current name the first time they are needed
+            legacy_path = legacy_cache_path(key)
+            data = _read_cache_file(legacy_path)
+            if data is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    try:
+                        os.replace(legacy_path, path)
+                    except FileNotFoundError:
+                        # either the subdirectory doesn't exist yet, or another process moved it first
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        os.replace(legacy_path, path)
+
+        if data is None:
+            stream = await fetch(key)
+            if stream is None:
+                return None
+
+            # this is the stream's own buffer (not a copy, unlike `read()`), and it is the whole
+            # image wherever the stream's position is, so it doesn't need to be rewound either
+            data = stream.getvalue()
+
+            # written to a temporary file first and then moved in place, which is atomic,
+            # so a cached file is never seen half-written, even if the process dies mid-write
+            tmp = f'{path}.{os.getpid()}-{next(_temp_ids)}.tmp'
+            try:
+                _write_cache_file(tmp, data)
+                os.replace(tmp, path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp)
+                raise
+
+            _schedule_cache_eviction()
+
+        memory[key] = data
+        if len(memory) > self._max_entries:
+            memory.popitem(last=False)
+
+        return data
+
+    def prewarm(self, emojis: Iterable[str] = (), discord_emojis: Iterable[int] = (), /) -> None:
+        """Hints the operating system to start reading the cached images of the given emojis,
+        so that they are already in memory by the time they are retrieved.
+
+        This returns immediately, the images are read in the background.
+        Emojis that are kept in memory or not cached yet are skipped. This does nothing
+        on platforms without :func:`os.posix_fadvise`.
+
+        Parameters
+        ----------
+        emojis: Iterable[str]
+            The unicode emojis that are about to be retrieved.
+        discord_emojis: Iterable[int]
+            The IDs of the Discord emojis that are about to be retrieved.
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+
+        paths = [self._emoji_cache_path(emoji) for emoji in emojis if emoji not in self._memory]
+        paths += [self._discord_cache_path(id) for id in discord_emojis if id not in self._discord_memory]
+
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    async def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        return await self._get_cached(
+            self._memory, emoji, self._emoji_cache_path, self._source.get_emoji, self._legacy_emoji_cache_path
+        )
 
     async def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
-        path = self._discord_cache_path(id)
-        if os.path.exists(path):
-            async with aiofiles.open(path, 'rb') as f:
-                return BytesIO(await f.read())
-        data = await self._source.get_discord_emoji(id)
-        if data is not None:
-            async with aiofiles.open(path, 'wb') as f:
-                await f.write(data.read())
-            data.seek(0)
-            return data
+        # the wrapped source may not support Discord emojis at all
+        fetch = getattr(self._source, 'get_discord_emoji', None)
+        if fetch is None:
+            return None
+
+        return await self._get_cached(
+            self._discord_memory, id, self._discord_cache_path, fetch,
+            self._legacy_discord_cache_path
+        )
 
 
 # Aliases